@@ -0,0 +1,62 @@
+"""
+Angles NB - Calcolo dei 4 angoli articolari in un'unica chiamata.
+Se Numba è installato il kernel viene compilato (con firma esplicita, quindi
+senza latenza di JIT al primo frame); altrimenti si usa la versione Python.
+"""
+
+import math
+import types
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # Numba è opzionale
+    njit = None
+
+
+# Ordine delle righe nell'array (6, 2) passato a pose_angles
+SHOULDER, ELBOW, WRIST, HIP, KNEE, ANKLE = range(6)
+
+# Nomi degli angoli, nello stesso ordine dell'array restituito da pose_angles
+ANGLE_NAMES = ("Ginocchio", "Anca", "Spalla", "Gomito")
+
+
+def _angle_py(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> float:
+    """Angolo in gradi (0-180) tra i punti a, b, c con vertice in b."""
+    radians = math.atan2(cy - by, cx - bx) - math.atan2(ay - by, ax - bx)
+    angle = abs(math.degrees(radians))
+    if angle > 180.0:
+        angle = 360.0 - angle
+    return angle
+
+
+def _pose_angles(p: np.ndarray) -> np.ndarray:
+    """Calcola Ginocchio, Anca, Spalla e Gomito da un array (6, 2) float32 di (x, y).
+
+    Versione in Python puro (usa _angle_py): è il fallback senza Numba e il
+    riferimento nei test. Il kernel compilato usa lo stesso corpo con _angle_nb.
+    """
+    out = np.empty(4, dtype=np.float32)
+    # 1. Stinco rispetto al femorale (Angolo Ginocchio: Hip - Knee - Ankle)
+    out[0] = _angle_py(p[HIP, 0], p[HIP, 1], p[KNEE, 0], p[KNEE, 1], p[ANKLE, 0], p[ANKLE, 1])
+    # 2. Femorale rispetto al busto (Angolo Anca/Bacino: Shoulder - Hip - Knee)
+    out[1] = _angle_py(p[SHOULDER, 0], p[SHOULDER, 1], p[HIP, 0], p[HIP, 1], p[KNEE, 0], p[KNEE, 1])
+    # 3. Busto rispetto all'omero (Angolo Spalla: Hip - Shoulder - Elbow)
+    out[2] = _angle_py(p[HIP, 0], p[HIP, 1], p[SHOULDER, 0], p[SHOULDER, 1], p[ELBOW, 0], p[ELBOW, 1])
+    # 4. Omero rispetto all'avambraccio (Angolo Gomito: Shoulder - Elbow - Wrist)
+    out[3] = _angle_py(p[SHOULDER, 0], p[SHOULDER, 1], p[ELBOW, 0], p[ELBOW, 1], p[WRIST, 0], p[WRIST, 1])
+    return out
+
+
+if njit is not None:
+    # nogil: il kernel non blocca il DecoderThread che gira in parallelo
+    _angle_nb = njit(cache=True, fastmath=True, nogil=True)(_angle_py)
+    # Stesso codice di _pose_angles, ma con _angle_py risolto su _angle_nb:
+    # la versione Python resta pura anche con Numba installato
+    _pose_angles_nb = types.FunctionType(
+        _pose_angles.__code__, {**globals(), "_angle_py": _angle_nb}, "_pose_angles_nb"
+    )
+    pose_angles = njit("float32[:](float32[:, ::1])", cache=True, fastmath=True, nogil=True)(_pose_angles_nb)
+else:
+    pose_angles = _pose_angles
@@ -1,6 +1,6 @@
 """
 Pose Detector - Wrapper attorno a MediaPipe PoseLandmarker (Tasks API).
-Elabora singoli frame BGR (OpenCV) e restituisce il frame
+Elabora singoli frame BGR (OpenCV) e restituisce il frame RGB
 con i landmark disegnati + i risultati raw di MediaPipe.
 """
 
@@ -15,11 +15,10 @@ from mediapipe.tasks.python.vision import (
     PoseLandmarkerOptions,
     PoseLandmarksConnections,
     RunningMode,
-    drawing_utils,
     drawing_styles,
 )
 
-from core.utils import calculate_angle
+from core.angles_nb import ANGLE_NAMES, pose_angles
 
 
 # Percorso di default del modello (relativo alla root del progetto)
@@ -27,120 +26,302 @@ _DEFAULT_MODEL_PATH = os.path.join(
     os.path.dirname(__file__), "..", "..", "assets", "models", "pose_landmarker_lite.task"
 )
 
+# Delegate GPU (OpenGL/Metal) opzionale: attivo solo con POSE_USE_GPU=1,
+# così le macchine headless (CI) restano sulla CPU.
+_USE_GPU = os.environ.get("POSE_USE_GPU") == "1"
+
+# Conversione colore via OpenCL (cv2.UMat) opzionale: attiva solo con
+# POSE_USE_OPENCL=1 e se OpenCV trova un device OpenCL. Su frame piccoli
+# upload/download possono costare più della conversione stessa.
+_USE_OPENCL = os.environ.get("POSE_USE_OPENCL") == "1" and cv2.ocl.haveOpenCL()
+if _USE_OPENCL:
+    cv2.ocl.setUseOpenCL(True)
+
+# Connessioni dello scheletro come array (N, 2) di indici di landmark
+_POSE_EDGES = np.array(
+    [(c.start, c.end) for c in PoseLandmarksConnections.POSE_LANDMARKS], dtype=np.int32
+)
+
+# Stile di disegno (colori in ordine RGB, il frame annotato è RGB)
+_LANDMARK_COLOR = (0, 255, 0)
+_CONNECTION_COLOR = (0, 255, 255)
+_BORDER_COLOR = (224, 224, 224)  # WHITE_COLOR di drawing_utils
+_THICKNESS = 2
+_CIRCLE_RADIUS = 2
+
+# Landmark usati per gli angoli, nell'ordine atteso da pose_angles:
+# Left Shoulder, Left Elbow, Left Wrist, Left Hip, Left Knee, Left Ankle
+_ANGLE_LANDMARKS = (11, 13, 15, 23, 25, 27)
+
+# Salto del timestamp (ms) applicato da reset() per segnalare a MediaPipe
+# una discontinuità (nuova sessione o seek)
+_RESET_GAP_MS = 1000
+
+# Landmark restituiti da PoseLandmarker per ogni posa
+_NUM_LANDMARKS = 33
+
+# Stessa soglia usata da drawing_utils (per visibility e presence) per
+# nascondere i landmark incerti
+_VISIBILITY_THRESHOLD = 0.5
+
+
+def _bgr_to_rgb(frame: np.ndarray, dst: np.ndarray) -> None:
+    """Converte frame (BGR) in RGB dentro dst, su GPU via OpenCL se abilitato."""
+    if _USE_OPENCL:
+        rgb = cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2RGB)
+        np.copyto(dst, rgb.get())
+    else:
+        cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_BGR2RGB, dst=dst)
+
+
+def _draw_landmarks(image: np.ndarray, landmarks: np.ndarray) -> None:
+    """Disegna scheletro e landmark di una posa direttamente su image.
+
+    Riproduce l'aspetto di drawing_utils.draw_landmarks, ma lavora sull'array
+    (N, 3) prodotto da PoseDetector._extract_landmarks_np e disegna tutte le
+    connessioni con un'unica chiamata a cv2.polylines.
+    """
+    h, w = image.shape[:2]
+    n = len(landmarks)
+    xy = landmarks[:, :2]
+    pts = (xy * (w, h)).astype(np.int32)
+    np.minimum(pts, (w - 1, h - 1), out=pts)
+    visible = (
+        (landmarks[:, 2] >= _VISIBILITY_THRESHOLD)
+        & (xy >= 0.0).all(axis=1)
+        & (xy <= 1.0).all(axis=1)
+    )
+
+    # Una connessione si disegna solo se entrambi gli estremi sono visibili
+    edges = _POSE_EDGES[(_POSE_EDGES < n).all(axis=1)]
+    edges = edges[visible[edges[:, 0]] & visible[edges[:, 1]]]
+    if len(edges):
+        cv2.polylines(image, list(pts[edges]), False, _CONNECTION_COLOR, _THICKNESS)
+
+    border_radius = max(_CIRCLE_RADIUS + 1, int(_CIRCLE_RADIUS * 1.2))
+    for x, y in pts[visible].tolist():
+        cv2.circle(image, (x, y), border_radius, _BORDER_COLOR, _THICKNESS)
+        cv2.circle(image, (x, y), _CIRCLE_RADIUS, _LANDMARK_COLOR, _THICKNESS)
+
 
 class PoseDetector:
     """Rileva la posa umana in un frame video usando MediaPipe PoseLandmarker.
 
-    NOTA: Questa classe NON è thread-safe. Deve essere creata e usata
-    sullo stesso thread. Il VideoProcessor la crea dentro run().
+    NOTA: Questa classe NON è thread-safe: va usata da un solo thread alla
+    volta. Il VideoProcessor la crea nel proprio __init__ e ne carica il
+    modello in load_video() (thread GUI) solo mentre il suo thread è fermo;
+    durante la riproduzione la usa esclusivamente run().
     """
 
-    def __init__(self, model_path: str | None = None):
+    def __init__(self, model_path: str | None = None, max_input_width: int | None = 640,
+                 detect_every: int = 1,
+                 min_detection_confidence: float = 0.5,
+                 min_presence_confidence: float = 0.7,
+                 min_tracking_confidence: float = 0.7):
+        """
+        Args:
+            model_path: percorso del file .task (default: modello lite in assets).
+            max_input_width: larghezza massima del frame passato a MediaPipe.
+                I frame più larghi vengono ridotti solo per l'inferenza; i
+                landmark (normalizzati) si disegnano comunque sul frame intero.
+                None disabilita il ridimensionamento.
+            detect_every: esegue il modello un frame ogni N; nei frame
+                intermedi vengono riusati gli ultimi landmark rilevati.
+            min_detection_confidence: soglia del detector di persone.
+            min_presence_confidence: soglia di presenza della posa.
+            min_tracking_confidence: soglia sotto cui il tracking viene
+                abbandonato e si rilancia la detection. I default (0.7) sono
+                pensati per video con un singolo soggetto ben visibile.
+        """
         model = model_path or _DEFAULT_MODEL_PATH
         self._model_path = os.path.abspath(model)
+        self._max_input_width = max_input_width
+        self._min_detection_confidence = min_detection_confidence
+        self._min_presence_confidence = min_presence_confidence
+        self._min_tracking_confidence = min_tracking_confidence
         self._landmarker: PoseLandmarker | None = None
         self._frame_timestamp_ms = 0
+        self._ms_per_frame = 33
+        self._ms_per_frame_fps = 30.0
+        self._detect_every = max(1, detect_every)
+        self._frame_index = 0
+        self._last_results = None
+        self._rgb_buf: np.ndarray | None = None
+        self._angle_buf = np.empty((len(_ANGLE_LANDMARKS), 2), dtype=np.float32)
+        # Landmark dell'ultima detection come (x, y, affidabilità), vedi
+        # _extract_landmarks_np; _lm_count = 0 se non c'è nessuna posa
+        self._lm_buf = np.empty((_NUM_LANDMARKS, 3), dtype=np.float32)
+        self._lm_count = 0
 
     def _ensure_initialized(self) -> None:
         """Inizializza il PoseLandmarker la prima volta che viene usato."""
         if self._landmarker is not None:
             return
 
+        if _USE_GPU:
+            try:
+                self._landmarker = self._create_landmarker(BaseOptions.Delegate.GPU)
+            except (RuntimeError, NotImplementedError) as e:
+                # GPU non disponibile (driver, contesto GL assente...) o non
+                # supportata da MediaPipe su questa piattaforma: ripiega su CPU
+                print(f"[PoseDetector] Delegate GPU non disponibile, uso la CPU: {e}")
+
+        if self._landmarker is None:
+            self._landmarker = self._create_landmarker(BaseOptions.Delegate.CPU)
+        self._frame_timestamp_ms = 0
+
+    def _create_landmarker(self, delegate: BaseOptions.Delegate) -> PoseLandmarker:
+        """Crea il PoseLandmarker con il delegate richiesto (CPU o GPU)."""
         options = PoseLandmarkerOptions(
-            base_options=BaseOptions(model_asset_path=self._model_path),
+            base_options=BaseOptions(model_asset_path=self._model_path, delegate=delegate),
+            # VIDEO e non LIVE_STREAM: ogni frame decodificato va annotato e
+            # mostrato, mentre detect_async scarta i frame quando il modello è
+            # occupato e restituisce i risultati fuori ordine rispetto ai seek.
+            # La sovrapposizione decodifica/inferenza la fornisce già il
+            # DecoderThread del VideoProcessor.
             running_mode=RunningMode.VIDEO,
             num_poses=1,
-            min_pose_detection_confidence=0.5,
-            min_pose_presence_confidence=0.5,
-            min_tracking_confidence=0.5,
+            min_pose_detection_confidence=self._min_detection_confidence,
+            min_pose_presence_confidence=self._min_presence_confidence,
+            min_tracking_confidence=self._min_tracking_confidence,
+            # Le maschere di segmentazione non servono: niente testa di segmentazione
+            output_segmentation_masks=False,
         )
-        self._landmarker = PoseLandmarker.create_from_options(options)
-        self._frame_timestamp_ms = 0
+        return PoseLandmarker.create_from_options(options)
 
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
 
     def process_frame(self, frame: np.ndarray, fps: float = 30.0) -> tuple[np.ndarray, object, dict]:
-        """Elabora un frame BGR e restituisce (frame_annotato, results, angles).
+        """Elabora un frame BGR e restituisce (frame_annotato_rgb, results, angles).
 
         Args:
             frame: immagine BGR (OpenCV).
             fps: framerate del video, usato per calcolare il timestamp.
 
         Returns:
-            frame_out: copia del frame con i landmark disegnati.
+            frame_out: frame convertito in RGB con i landmark disegnati. È
+                un buffer interno riscritto dalla chiamata successiva: chi
+                deve conservarlo ne fa una copia (il VideoProcessor lo
+                converte subito nel proprio buffer di visualizzazione).
             results: PoseLandmarkerResult.
             angles: dict con gli angoli {nome: valore}.
         """
         self._ensure_initialized()
 
-        # Converti BGR → RGB e crea un mp.Image
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+        # Un'unica conversione BGR → RGB in un buffer preallocato: lo stesso
+        # buffer viene passato a MediaPipe e poi usato per il disegno, senza
+        # un secondo frame.copy(). Il buffer è C-contiguous, quindi
+        # MediaPipe lo carica senza riordinarlo.
+        frame_rgb = self._rgb_buffer(frame)
+        _bgr_to_rgb(frame, frame_rgb)
 
         # Incrementa il timestamp in base al vero FPS del video
-        self._frame_timestamp_ms += int(1000.0 / fps)
-        results = self._landmarker.detect_for_video(mp_image, self._frame_timestamp_ms)
+        # (il passo in ms si ricalcola solo quando cambia l'FPS)
+        if fps != self._ms_per_frame_fps:
+            self._ms_per_frame_fps = fps
+            self._ms_per_frame = int(1000.0 / fps)
+        self._frame_timestamp_ms += self._ms_per_frame
+
+        # Nei frame intermedi (detect_every > 1) non si chiama il modello:
+        # si ridisegnano gli ultimi landmark, che a 30 FPS cambiano poco
+        self._frame_index += 1
+        if self._last_results is not None and self._frame_index % self._detect_every != 0:
+            results = self._last_results
+        else:
+            results = self._detect(frame_rgb)
+            self._last_results = results
+            # Unica lettura dei landmark (num_poses=1): disegno, angoli e
+            # frame intermedi lavorano poi solo sull'array _lm_buf
+            self._lm_count = (
+                self._extract_landmarks_np(results.pose_landmarks[0])
+                if results.pose_landmarks else 0
+            )
 
         angles = {}
 
-        # Disegna i landmark sul frame originale (BGR)
-        frame_out = frame.copy()
-        if results.pose_landmarks:
-            for pose_landmarks in results.pose_landmarks:
-                drawing_utils.draw_landmarks(
-                    image=frame_out,
-                    landmark_list=pose_landmarks,
-                    connections=PoseLandmarksConnections.POSE_LANDMARKS,
-                    landmark_drawing_spec=drawing_utils.DrawingSpec(
-                        color=(0, 255, 0), thickness=2, circle_radius=2
-                    ),
-                    connection_drawing_spec=drawing_utils.DrawingSpec(
-                        color=(255, 255, 0), thickness=2
-                    ),
-                )
-                
-                # Estrazione angoli (usiamo il lato sinistro come default, indici dispari)
-                # Left Shoulder = 11, Left Elbow = 13, Left Wrist = 15
-                # Left Hip = 23, Left Knee = 25, Left Ankle = 27
-                try:
-                    def get_coords(idx):
-                        lm = pose_landmarks[idx]
-                        return (lm.x, lm.y)
-                        
-                    l_sh = get_coords(11)
-                    l_el = get_coords(13)
-                    l_wr = get_coords(15)
-                    l_hi = get_coords(23)
-                    l_kn = get_coords(25)
-                    l_an = get_coords(27)
-                    
-                    # 1. Stinco rispetto al femorale (Angolo Ginocchio: Hip - Knee - Ankle)
-                    angles["Ginocchio"] = calculate_angle(l_hi, l_kn, l_an)
-                    
-                    # 2. Femorale rispetto al busto (Angolo Anca/Bacino: Shoulder - Hip - Knee)
-                    angles["Anca"] = calculate_angle(l_sh, l_hi, l_kn)
-                    
-                    # 3. Busto rispetto all'omero (Angolo Spalla: Hip - Shoulder - Elbow)
-                    angles["Spalla"] = calculate_angle(l_hi, l_sh, l_el)
-                    
-                    # 4. Omero rispetto all'avambraccio (Angolo Gomito: Shoulder - Elbow - Wrist)
-                    angles["Gomito"] = calculate_angle(l_sh, l_el, l_wr)
-                except IndexError:
-                    pass # Landmark mancanti
+        # Disegna i landmark direttamente sul buffer RGB
+        frame_out = frame_rgb
+        if self._lm_count:
+            landmarks = self._lm_buf[:self._lm_count]
+            _draw_landmarks(frame_out, landmarks)
+
+            # Estrazione angoli (usiamo il lato sinistro come default, indici dispari)
+            # Left Shoulder = 11, Left Elbow = 13, Left Wrist = 15
+            # Left Hip = 23, Left Knee = 25, Left Ankle = 27
+            if self._lm_count > max(_ANGLE_LANDMARKS):
+                np.take(landmarks[:, :2], _ANGLE_LANDMARKS, axis=0, out=self._angle_buf)
+                for name, value in zip(ANGLE_NAMES, pose_angles(self._angle_buf)):
+                    angles[name] = float(value)
 
         return frame_out, results, angles
 
+    def _detect(self, frame_rgb: np.ndarray):
+        """Esegue MediaPipe sul frame RGB e restituisce il PoseLandmarkerResult."""
+        # Il modello lavora comunque a bassa risoluzione: riduciamo qui i frame
+        # grandi così MediaPipe non deve copiarli e scalarli a piena risoluzione
+        frame_in = frame_rgb
+        h, w = frame_rgb.shape[:2]
+        if self._max_input_width is not None and w > self._max_input_width:
+            new_h = int(h * self._max_input_width / w)
+            frame_in = cv2.resize(
+                frame_rgb, (self._max_input_width, new_h), interpolation=cv2.INTER_LINEAR
+            )
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_in)
+        return self._landmarker.detect_for_video(mp_image, self._frame_timestamp_ms)
+
+    def _extract_landmarks_np(self, pose_landmarks) -> int:
+        """Copia i landmark di una posa in _lm_buf e restituisce quanti sono.
+
+        Ogni riga è (x, y, affidabilità) con affidabilità = min(visibility,
+        presence); i valori mancanti contano come 1.0.
+        """
+        buf = self._lm_buf
+        n = min(len(pose_landmarks), _NUM_LANDMARKS)
+        for i in range(n):
+            lm = pose_landmarks[i]
+            vis = 1.0 if lm.visibility is None else lm.visibility
+            pres = 1.0 if lm.presence is None else lm.presence
+            buf[i, 0] = lm.x
+            buf[i, 1] = lm.y
+            buf[i, 2] = min(vis, pres)
+        return n
+
+    def warm_up(self) -> None:
+        """Crea subito il landmarker, invece che al primo process_frame."""
+        self._ensure_initialized()
+
+    def set_detect_every(self, n: int) -> None:
+        """Imposta ogni quanti frame eseguire il modello (1 = tutti)."""
+        self._detect_every = max(1, n)
+
+    def _rgb_buffer(self, frame: np.ndarray) -> np.ndarray:
+        """Restituisce il buffer RGB, riallocandolo se cambia la shape del frame."""
+        if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+            self._rgb_buf = np.empty(frame.shape, dtype=np.uint8)
+        return self._rgb_buf
+
     def reset(self) -> None:
-        """Chiude e ricrea il landmarker per una nuova sessione video."""
-        if self._landmarker is not None:
-            self._landmarker.close()
-            self._landmarker = None
-        self._frame_timestamp_ms = 0
+        """Prepara il detector per una nuova sessione video o dopo un seek.
+
+        Il landmarker resta aperto (ricrearlo costa centinaia di ms): si
+        scartano i risultati in cache e il timestamp salta in avanti di
+        _RESET_GAP_MS (in modalità VIDEO MediaPipe lo richiede crescente,
+        quindi non può tornare a zero). Con un intervallo così lungo i filtri
+        di smoothing dei landmark non trascinano più la posa precedente.
+        La ROI del tracking invece resta quella vecchia: se la persona non è
+        più lì la confidenza scende sotto min_tracking_confidence e il
+        landmarker rilancia da sé la detection.
+        """
+        self._frame_timestamp_ms += _RESET_GAP_MS
+        self._frame_index = 0
+        self._last_results = None
+        self._lm_count = 0
 
     def release(self) -> None:
-        """Rilascia le risorse di MediaPipe."""
+        """Rilascia le risorse di MediaPipe e i buffer dei frame."""
         if self._landmarker is not None:
             self._landmarker.close()
             self._landmarker = None
+        self._rgb_buf = None
@@ -0,0 +1,51 @@
+"""
+Offline Worker - Funzioni eseguite dai processi del pool nella modalità
+offline del VideoProcessor. Ogni processo possiede il proprio PoseDetector;
+i frame arrivano e ripartono in un blocco di shared memory, senza pickle.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.detector import PoseDetector
+
+
+# Detector del processo corrente, creato una sola volta da init_worker()
+_detector: PoseDetector | None = None
+
+
+def init_worker() -> None:
+    """Initializer del pool: crea il PoseDetector di questo processo."""
+    global _detector
+    _detector = PoseDetector()
+
+
+def process_chunk(task: tuple[str, tuple[int, ...], float]) -> tuple[str, tuple[int, ...], list[dict]]:
+    """Elabora un blocco di frame BGR salvato in shared memory.
+
+    Args:
+        task: (nome del blocco, shape (n, h, w, 3), fps del video).
+
+    Returns:
+        (nome del blocco, shape, angoli di ogni frame). I frame annotati
+        (RGB) vengono riscritti nello stesso blocco al posto degli originali.
+    """
+    shm_name, shape, fps = task
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    try:
+        # I blocchi arrivano a questo processo non contigui (imap li dà al
+        # primo worker libero): reset() scarta i landmark del blocco
+        # precedente e segnala a MediaPipe la discontinuità temporale
+        _detector.reset()
+        angles_list = []
+        for i in range(shape[0]):
+            annotated, _, angles = _detector.process_frame(frames[i], fps=fps)
+            frames[i] = annotated
+            angles_list.append(angles)
+        return shm_name, shape, angles_list
+    finally:
+        # La view va rilasciata prima di chiudere il blocco
+        del frames
+        shm.close()
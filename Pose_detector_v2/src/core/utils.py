@@ -1,24 +1,36 @@
 import numpy as np
 
-def calculate_angle(a: tuple[float, float], b: tuple[float, float], c: tuple[float, float]) -> float:
-    """Calcola l'angolo in gradi tra 3 punti (a, b, c) con vertice in b.
-    
+
+def skip_step(fc, ratio: float):
+    """Frame da leggere alla posizione fc per tenere il rapporto ratio.
+
+    max(1, int(fc * ratio) - int((fc - 1) * ratio)): unica definizione,
+    usata sia per la tabella di skip_schedule sia dal DecoderThread oltre
+    la fine della tabella.
+
+    Args:
+        fc: posizione (int) o array NumPy di posizioni.
+        ratio: fps del video / fps target.
+
+    Returns:
+        Il numero di frame (float NumPy, o array per fc array).
+    """
+    return np.maximum(np.trunc(fc * ratio) - np.trunc((fc - 1) * ratio), 1)
+
+
+def skip_schedule(total_frames: int, ratio: float) -> list[int]:
+    """Tabella di skip_step per ogni posizione quando fps > target.
+
+    Calcolata una volta sola per tutto il video, così il DecoderThread non
+    ripete il calcolo a ogni frame.
+
     Args:
-        a: (x, y) del primo punto
-        b: (x, y) del vertice dell'angolo
-        c: (x, y) del secondo punto
-        
+        total_frames: numero di frame del video (negativo = sconosciuto).
+        ratio: fps del video / fps target.
+
     Returns:
-        Angolo in gradi tra 0 e 180.
+        Lista di total_frames + 1 interi (una lista si indicizza più in
+        fretta di un array NumPy nel loop del decoder).
     """
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    
-    if angle > 180.0:
-        angle = 360.0 - angle
-        
-    return angle
+    fc = np.arange(max(total_frames, 0) + 1, dtype=np.float64)
+    return skip_step(fc, ratio).astype(np.int32).tolist()
@@ -1,95 +1,479 @@
 """
 Video Processor - QThread che legge un file video con OpenCV,
 elabora ogni frame con il PoseDetector e lo invia alla GUI.
+La decodifica avviene in anticipo su un thread dedicato (DecoderThread).
 """
 
+import multiprocessing
+import os
+import re
+import threading
 import time
 import traceback
+from collections import deque
+from multiprocessing import shared_memory
 
 import cv2
 import numpy as np
-from PyQt6.QtCore import QThread, pyqtSignal, QMutex, QMutexLocker
+from PyQt6.QtCore import QThread, pyqtSignal, QMutex, QMutexLocker, QWaitCondition
+from PyQt6.QtGui import QImage
 
+from core import offline_worker
 from core.detector import PoseDetector
+from core.utils import skip_schedule, skip_step
+
+
+# Peso della media mobile esponenziale per l'FPS mostrato (~ultimi 30 frame)
+_FPS_EMA_ALPHA = 2.0 / (30 + 1)
+
+# Detection adattiva: se l'FPS medio resta sotto l'80% del target si esegue
+# il modello un frame ogni N (fino a _MAX_DETECT_EVERY), rivalutando ogni
+# _DETECT_ADAPT_INTERVAL frame per lasciare assestare la media.
+_MAX_DETECT_EVERY = 3
+_DETECT_ADAPT_INTERVAL = 30
+
+# Larghezza massima dei frame elaborati (vedi _limit_width)
+_MAX_WIDTH = 640
+
+# Modalità offline: frame per blocco inviato a un processo del pool
+_OFFLINE_CHUNK_SIZE = 8
+
+# Decodifica e ridimensionamento con una pipeline GStreamer (opzionale):
+# attiva solo con POSE_USE_GSTREAMER=1 e se OpenCV è compilato con GStreamer.
+_USE_GSTREAMER = (
+    os.environ.get("POSE_USE_GSTREAMER") == "1"
+    and re.search(r"GStreamer:\s*YES", cv2.getBuildInformation()) is not None
+)
+
+# Riduzione dei frame su GPU con cv2.cuda (opzionale): attiva solo con
+# POSE_USE_CUDA=1 e se OpenCV è compilato con CUDA e vede almeno un device.
+# Upload e download costano quanto il resize su frame piccoli: conviene
+# solo con sorgenti ad alta risoluzione.
+_USE_CUDA = (
+    os.environ.get("POSE_USE_CUDA") == "1"
+    and hasattr(cv2, "cuda")
+    and cv2.cuda.getCudaEnabledDeviceCount() > 0
+)
+
+# Intervallo minimo (s) tra due status_updated: ~10 Hz bastano per slider,
+# FPS e angoli, e la coda eventi della GUI resta libera per i frame
+_STATUS_INTERVAL = 0.1
+
+# Ritardo massimo (in frame) recuperato dal pacing senza ripartire da adesso
+_MAX_CATCH_UP_FRAMES = 2
+
+# Ultimo tratto di attesa del pacing fatto in busy-wait (vedi _precise_sleep)
+_SPIN_THRESHOLD = 0.002
+
+# Buffer di visualizzazione (vedi _next_display_buffer): il QImage emesso non
+# copia i pixel, quindi il buffer deve sopravvivere finché la GUI non lo disegna
+_FRAME_RING_SIZE = 3
+
+# Frame emessi in attesa di frame_displayed(): uno in meno dei buffer, così
+# quello in scrittura è sempre libero
+_MAX_FRAMES_IN_FLIGHT = _FRAME_RING_SIZE - 1
+
+
+def _gstreamer_pipeline(path: str) -> str:
+    """Pipeline GStreamer che decodifica il file e lo riduce a _MAX_WIDTH pixel.
+
+    decodebin sceglie da solo il decoder con rank più alto, quindi quello
+    hardware se presente (nvv4l2decoder, vaapih264dec, vtdec...).
+    Come _limit_width la pipeline riduce soltanto: la larghezza è un
+    intervallo [1, _MAX_WIDTH] e videoscale sceglie il valore più vicino a
+    quello sorgente, quindi i video più stretti passano invariati. La
+    riduzione avviene prima di videoconvert, che converte in BGR solo i
+    pixel già ridotti.
+    """
+    location = path.replace("\\", "/").replace('"', '\\"')
+    return (
+        f'filesrc location="{location}" ! decodebin ! videoscale ! '
+        f"video/x-raw,width=[1,{_MAX_WIDTH}],pixel-aspect-ratio=1/1 ! "
+        "videoconvert ! video/x-raw,format=BGR ! appsink sync=false"
+    )
+
+
+def _open_capture(path: str) -> cv2.VideoCapture:
+    """Apre il video chiedendo a FFmpeg la decodifica hardware se disponibile.
+
+    Con VIDEO_ACCELERATION_ANY OpenCV sceglie da solo il backend (VAAPI,
+    D3D11, NVDEC...) e ripiega sulla decodifica software quando non ce n'è
+    nessuno. Se l'apertura con FFmpeg fallisce si usa il backend di default.
+    Dove possibile il buffer interno del backend viene ridotto a un frame.
+
+    Con _USE_GSTREAMER si prova prima la pipeline di _gstreamer_pipeline: i
+    frame arrivano già ridotti e _limit_width non ha più niente da fare.
+    """
+    if _USE_GSTREAMER:
+        cap = cv2.VideoCapture(_gstreamer_pipeline(path), cv2.CAP_GSTREAMER)
+        if cap.isOpened():
+            return cap
+        cap.release()
+
+    cap = cv2.VideoCapture(
+        path,
+        cv2.CAP_FFMPEG,
+        [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY],
+    )
+    if not cap.isOpened():
+        cap.release()
+        cap = cv2.VideoCapture(path)
+    if cap.isOpened():
+        # Nessun frame accodato dal backend oltre a quello richiesto: seek e
+        # play mostrano subito il frame giusto. Non tutti i backend lo supportano.
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except cv2.error:
+            pass
+    return cap
+
+
+def _precise_sleep(dt: float) -> None:
+    """Attende dt secondi con precisione sub-millisecondo.
+
+    time.sleep() su Windows può avere una risoluzione di ~15 ms: si dorme
+    fino a _SPIN_THRESHOLD secondi prima della scadenza e il resto si
+    attende in busy-wait su perf_counter().
+    """
+    deadline = time.perf_counter() + dt
+    if dt > _SPIN_THRESHOLD:
+        time.sleep(dt - _SPIN_THRESHOLD)
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _limit_width(frame: np.ndarray, dst: np.ndarray | None = None) -> np.ndarray:
+    """Riduce il frame a una larghezza massima di _MAX_WIDTH pixel.
+
+    Se dst ha già la shape ridotta il risultato viene scritto lì senza
+    allocare un nuovo array. Per riduzioni fino a ~3x INTER_LINEAR è molto
+    più veloce di INTER_AREA con una differenza visiva trascurabile.
+    """
+    h, w = frame.shape[:2]
+    if w <= _MAX_WIDTH:
+        return frame
+    new_h = int(h * _MAX_WIDTH / w)
+    return cv2.resize(frame, (_MAX_WIDTH, new_h), dst=dst, interpolation=cv2.INTER_LINEAR)
+
+
+def _resize_buffer(width: int, height: int) -> np.ndarray | None:
+    """Alloca il buffer di destinazione di _limit_width per un video width x height.
+
+    Restituisce None se i frame non vanno ridotti.
+    """
+    if width <= _MAX_WIDTH:
+        return None
+    new_h = int(height * _MAX_WIDTH / width)
+    return np.empty((new_h, _MAX_WIDTH, 3), dtype=np.uint8)
+
+
+class DecoderThread(QThread):
+    """Thread produttore che decodifica i frame in anticipo.
+
+    I frame vengono accodati in una deque limitata a `capacity` elementi,
+    protetta da un QMutex: quando la coda è piena il decoder si blocca su un
+    QWaitCondition finché il VideoProcessor non consuma un frame. Così la
+    decodifica con OpenCV si sovrappone all'inferenza di MediaPipe, che resta
+    sul solo thread del VideoProcessor.
+
+    Anche la riduzione a _MAX_WIDTH avviene qui, in un ring di buffer
+    preallocati: il consumer riceve frame già pronti per il detector.
+
+    Il decoder è l'unico a usare il VideoCapture finché è attivo; per un
+    seek va fermato con stop() e ricreato.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, fps: float, target_fps: float,
+                 start_frame: int, after_seek: bool, schedule: list[int] | None = None,
+                 capacity: int = 3, parent=None):
+        super().__init__(parent)
+        self.error: Exception | None = None
+        self._cap = cap
+        self._fps = fps
+        self._target_fps = target_fps
+        self._frame_count = start_frame
+        self._after_seek = after_seek
+        self._schedule = schedule or []
+        self._capacity = capacity
+        self._mutex = QMutex()
+        self._not_empty = QWaitCondition()
+        self._not_full = QWaitCondition()
+        self._frames: deque = deque()
+        self._stop_requested = False
+        # Frame in coda + quello in uso dal consumer + quello in scrittura:
+        # un buffer viene riscritto solo quando nessuno lo legge più
+        resize_buf = _resize_buffer(
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        )
+        self._resize_bufs = (
+            [resize_buf] + [np.empty_like(resize_buf) for _ in range(capacity + 1)]
+            if resize_buf is not None else []
+        )
+        self._resize_idx = 0
+        # Coppia di GpuMat riusata a ogni frame per il resize su GPU
+        self._gpu_src = cv2.cuda_GpuMat() if _USE_CUDA and self._resize_bufs else None
+        self._gpu_dst = cv2.cuda_GpuMat() if self._gpu_src is not None else None
+
+    # ------------------------------------------------------------------
+    # Public API (chiamato dal thread del VideoProcessor)
+    # ------------------------------------------------------------------
+
+    def pop(self) -> tuple[np.ndarray, int] | None:
+        """Attende e restituisce (frame_bgr, frame_count); None a fine video."""
+        with QMutexLocker(self._mutex):
+            while not self._frames:
+                self._not_empty.wait(self._mutex)
+            item = self._frames.popleft()
+            self._not_full.wakeOne()
+            return item
+
+    def stop(self) -> None:
+        """Ferma il decoder, scarta i frame in coda e attende che rilasci il VideoCapture."""
+        with QMutexLocker(self._mutex):
+            self._stop_requested = True
+            self._frames.clear()
+            self._not_full.wakeAll()
+        self.wait()
+
+    # ------------------------------------------------------------------
+    # Thread run
+    # ------------------------------------------------------------------
+
+    def run(self) -> None:
+        try:
+            self._read_loop()
+        except Exception as e:
+            self.error = e
+            self._push(None)
+
+    def _read_loop(self) -> None:
+        frame_skip_ratio = self._fps / self._target_fps if self._fps > self._target_fps else 1.0
+        skip = not self._after_seek
+
+        while True:
+            frames_to_read = 1
+            # Saltiamo i frame in eccesso solo se NON stiamo facendo seek manuale
+            if skip and self._fps > self._target_fps:
+                fc = self._frame_count
+                if fc < len(self._schedule):
+                    frames_to_read = self._schedule[fc]
+                else:
+                    # Oltre il FRAME_COUNT dichiarato dal container
+                    frames_to_read = int(skip_step(fc, frame_skip_ratio))
+                # grab() avanza senza convertire né copiare i frame scartati
+                for _ in range(frames_to_read - 1):
+                    self._cap.grab()
+            skip = True
+
+            ret, frame = self._cap.read()
+            if not ret:
+                # None segnala la fine del video al consumer
+                self._push(None)
+                return
+
+            if self._resize_bufs:
+                frame = self._resize(frame, self._resize_bufs[self._resize_idx])
+                self._resize_idx = (self._resize_idx + 1) % len(self._resize_bufs)
+            else:
+                frame = _limit_width(frame)
+
+            # Posizione tenuta a mano: niente CAP_PROP_POS_FRAMES a ogni frame
+            self._frame_count += frames_to_read
+            if not self._push((frame, self._frame_count)):
+                return
+
+    def _resize(self, frame: np.ndarray, dst: np.ndarray) -> np.ndarray:
+        """Riduce il frame in dst, su GPU se _USE_CUDA, altrimenti con _limit_width."""
+        if self._gpu_src is None or frame.shape[1] <= _MAX_WIDTH:
+            return _limit_width(frame, dst)
+        self._gpu_src.upload(frame)
+        cv2.cuda.resize(
+            self._gpu_src, (dst.shape[1], dst.shape[0]),
+            dst=self._gpu_dst, interpolation=cv2.INTER_LINEAR,
+        )
+        self._gpu_dst.download(dst)
+        return dst
+
+    def _push(self, item) -> bool:
+        """Accoda un elemento (bloccando se la coda è piena).
+
+        Restituisce False se nel frattempo è stato chiesto lo stop.
+        """
+        with QMutexLocker(self._mutex):
+            while len(self._frames) >= self._capacity and not self._stop_requested:
+                self._not_full.wait(self._mutex)
+            if self._stop_requested:
+                return False
+            self._frames.append(item)
+            self._not_empty.wakeOne()
+            return True
 
 
 class VideoProcessor(QThread):
     """Thread che elabora un video frame-per-frame.
 
     Signals:
-        frame_ready (np.ndarray): emesso con il frame BGR annotato.
+        frame_ready (QImage): emesso con il frame annotato in Format_RGB32 (senza
+            copia dei pixel). Il QImage punta a un buffer che verrà riscritto:
+            chi riceve il segnale deve copiarlo (es. QPixmap.fromImage) e poi
+            chiamare frame_displayed(). Senza conferma al massimo
+            _MAX_FRAMES_IN_FLIGHT frame restano in attesa: in tempo reale i
+            successivi non vengono emessi, in modalità offline l'elaborazione
+            si ferma finché non arriva la conferma.
         playback_finished (): emesso quando il video finisce.
-        fps_updated (float): emesso con il valore FPS corrente.
+        status_updated (dict): stato della riproduzione, al massimo ogni
+            _STATUS_INTERVAL secondi. Chiavi: "frame" (indice del frame
+            corrente), "fps" (FPS medio) e "angles" ({nome: valore_gradi});
+            "fps" e "angles" mancano se non ci sono valori nuovi.
         error_occurred (str): emesso con il messaggio di errore.
     """
 
-    frame_ready = pyqtSignal(np.ndarray)
+    frame_ready = pyqtSignal(QImage)
     playback_finished = pyqtSignal()
-    fps_updated = pyqtSignal(float)
+    status_updated = pyqtSignal(dict)
     error_occurred = pyqtSignal(str)
-    position_changed = pyqtSignal(int)  # Emesso con l'indice del frame corrente
-    angles_updated = pyqtSignal(dict)   # Emesso con gli angoli {nome: valore_gradi}
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, offline_mode: bool = False, n_workers: int | None = None):
+        """
+        Args:
+            offline_mode: invece della riproduzione a tempo reale, elabora il
+                video il più velocemente possibile distribuendo blocchi di
+                frame su un pool di processi (un PoseDetector ciascuno).
+            n_workers: processi del pool offline (default: CPU - 1).
+        """
         super().__init__(parent)
+        self._offline_mode = offline_mode
+        self._n_workers = n_workers or max(1, (os.cpu_count() or 2) - 1)
         self._mutex = QMutex()
         self._video_path: str | None = None
-        self._is_playing = False
-        self._stop_requested = False
-        self._seek_requested = False
+        # VideoCapture aperto da load_video() e riusato da run(), così
+        # l'inizializzazione del codec avviene una volta sola per video
+        self._cap: cv2.VideoCapture | None = None
+        # Flag letti a ogni frame: threading.Event non richiede il mutex
+        # sul percorso caldo. Il QMutex protegge solo path e target del seek.
+        self._play_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._seek_event = threading.Event()
+        # Svegliato (sotto _mutex) da play(), set_position() e stop_playback():
+        # il thread in pausa riparte subito, senza polling
+        self._state_changed = QWaitCondition()
+        # Stato accumulato tra due status_updated (vedi _publish_status)
+        self._pending_status: dict = {}
+        self._last_status_time = 0.0
         self._seek_target = 0
         self._total_frames = 0
-        self._detector: PoseDetector | None = None
+        # Unico detector, riusato da tutte le riproduzioni (vedi _get_detector).
+        # Il thread di run() è l'unico a usarlo mentre è attivo; load_video()
+        # e release() lo toccano solo a thread fermo. In modalità offline
+        # ogni processo del pool ha il proprio, quindi qui non serve.
+        self._detector: PoseDetector | None = None if offline_mode else PoseDetector()
+        # Frame emessi e non ancora confermati con frame_displayed(), al
+        # massimo _MAX_FRAMES_IN_FLIGHT: il buffer in scrittura non è mai uno
+        # di quelli ancora da disegnare. Mantenuto tra le sessioni: i frame
+        # di un video precedente possono essere ancora in coda nella GUI.
+        self._in_flight_cond = threading.Condition()
+        self._frames_in_flight = 0
+        # Buffer BGRA preallocati in cui _emit_frame converte i frame annotati
+        self._display_bufs: list[np.ndarray] = []
+        self._display_idx = 0
 
     # ------------------------------------------------------------------
     # Public API (chiamato dal thread GUI)
     # ------------------------------------------------------------------
 
     def load_video(self, path: str) -> tuple[bool, int, int, float, int]:
-        """Carica un video e restituisce (ok, width, height, fps, total_frames)."""
-        cap = cv2.VideoCapture(path)
+        """Carica un video e restituisce (ok, width, height, fps, total_frames).
+
+        Il VideoCapture resta aperto e viene riusato dalla riproduzione.
+        Se il thread della riproduzione precedente non si ferma entro il
+        timeout di stop_playback() il caricamento fallisce: il thread e il
+        suo DecoderThread potrebbero ancora leggere dal vecchio capture.
+        """
+        # Il thread potrebbe essere ancora vivo (es. in pausa) sul video precedente
+        if self.isRunning():
+            self.stop_playback()
+            if self.isRunning():
+                return False, 0, 0, 0.0, 0
+
+        cap = _open_capture(path)
         if not cap.isOpened():
+            cap.release()
             return False, 0, 0, 0.0, 0
 
         w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        cap.release()
 
+        self._release_capture()
         with QMutexLocker(self._mutex):
+            self._cap = cap
             self._video_path = path
             self._total_frames = total_frames
 
+        # Il modello si carica qui (una volta sola) e non alla pressione di Play.
+        # Siamo nel thread GUI: un errore (file .task mancante, delegate...)
+        # non deve uscire dallo slot. Il video resta caricato e il landmarker
+        # viene ricreato in run(), che segnala l'errore con error_occurred.
+        if self._detector is not None and not self.isRunning():
+            try:
+                self._detector.warm_up()
+            except Exception as e:
+                print(f"[VideoProcessor] Caricamento del modello fallito: {e}")
+
         return True, w, h, fps, total_frames
 
+    def frame_displayed(self) -> None:
+        """Segnala che la GUI ha convertito l'ultimo QImage ricevuto.
+
+        Va chiamato una volta per ogni frame_ready, dopo averlo copiato in un
+        QPixmap: da quel momento il buffer del frame può essere riscritto.
+        Il conteggio non viene azzerato tra una sessione e l'altra: anche i
+        frame di una sessione precedente ancora in coda vanno confermati.
+        """
+        with self._in_flight_cond:
+            if self._frames_in_flight > 0:
+                self._frames_in_flight -= 1
+            self._in_flight_cond.notify_all()
+
     def play(self) -> None:
         """Avvia o riprende la riproduzione."""
-        with QMutexLocker(self._mutex):
-            self._is_playing = True
-            self._stop_requested = False
+        self._stop_event.clear()
+        self._play_event.set()
+        self._wake_run_loop()
 
         if not self.isRunning():
             self.start()
 
     def pause(self) -> None:
         """Mette in pausa la riproduzione (il thread resta attivo)."""
-        with QMutexLocker(self._mutex):
-            self._is_playing = False
+        self._play_event.clear()
 
     def set_position(self, frame_idx: int) -> None:
         """Richiede di saltare a un frame specifico."""
         with QMutexLocker(self._mutex):
-            self._seek_requested = True
             self._seek_target = frame_idx
+            self._seek_event.set()
+            self._state_changed.wakeAll()
 
     def stop_playback(self) -> None:
         """Ferma completamente la riproduzione e il thread."""
-        with QMutexLocker(self._mutex):
-            self._is_playing = False
-            self._stop_requested = True
+        self._play_event.clear()
+        self._stop_event.set()
+        self._wake_run_loop()
 
         self.wait(3000)
+        # Il VideoCapture si chiude solo quando il thread non lo usa più
+        if not self.isRunning():
+            self._release_capture()
+
+    def _release_capture(self) -> None:
+        """Chiude il VideoCapture aperto da load_video(), se presente."""
+        with QMutexLocker(self._mutex):
+            cap = self._cap
+            self._cap = None
+        if cap is not None:
+            cap.release()
 
     # ------------------------------------------------------------------
     # Thread run
@@ -107,99 +491,427 @@ class VideoProcessor(QThread):
     def _run_internal(self) -> None:
         with QMutexLocker(self._mutex):
             path = self._video_path
+            cap = self._cap
 
         if path is None:
             return
 
-        cap = cv2.VideoCapture(path)
-        if not cap.isOpened():
-            self.error_occurred.emit("Impossibile aprire il video.")
-            return
+        if cap is None:
+            # Capture chiuso da uno stop: va riaperto
+            cap = _open_capture(path)
+            if not cap.isOpened():
+                cap.release()
+                self.error_occurred.emit("Impossibile aprire il video.")
+                return
+            with QMutexLocker(self._mutex):
+                self._cap = cap
+        elif cap.get(cv2.CAP_PROP_POS_FRAMES) > 0:
+            # Capture riusato da una riproduzione precedente: riparti dall'inizio
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
 
         fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        # Niente stato residuo di una sessione interrotta da stop
+        self._pending_status = {}
+        self._last_status_time = 0.0
+
+        if self._offline_mode:
+            self._run_offline(cap, fps)
+            self._reset_playback_flags()
+            return
+
         target_fps = min(fps, 30.0)
         frame_delay = 1.0 / target_fps
-        frame_skip_ratio = fps / target_fps if fps > target_fps else 1.0
-        
-        detector = PoseDetector()
+
+        detector = self._get_detector()
+        # Calcolata una volta per video e riusata dai decoder creati nei seek
+        schedule = (
+            skip_schedule(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), fps / target_fps)
+            if fps > target_fps else None
+        )
+        decoder = DecoderThread(cap, fps, target_fps, start_frame=0, after_seek=False,
+                                schedule=schedule)
+        decoder.start()
+
+        # Pacing a deadline monotona: ogni frame ha un istante di uscita
+        # fissato (next_deadline), così jitter e ritardi non si accumulano.
+        next_deadline: float | None = None
+        last_frame_time: float | None = None
+        fps_ema = 0.0
+
+        detect_every = 1
+        frames_since_adapt = 0
 
         try:
-            frame_count = 0
-            while cap.isOpened():
+            while True:
                 # Controlla stop e seek
-                with QMutexLocker(self._mutex):
-                    if self._stop_requested:
-                        break
-                    playing = self._is_playing
-                    seek_req = self._seek_requested
-                    seek_tgt = self._seek_target
-                    self._seek_requested = False
+                if self._stop_event.is_set():
+                    break
+                playing = self._play_event.is_set()
+                seek_tgt = self._take_seek_request()
+                seek_req = seek_tgt is not None
 
                 if seek_req:
+                    # Il decoder va fermato prima di toccare il VideoCapture;
+                    # i frame già decodificati in coda vengono scartati.
+                    decoder.stop()
                     cap.set(cv2.CAP_PROP_POS_FRAMES, seek_tgt)
-                    frame_count = seek_tgt
-                    # Dobbiamo resettare il MediaPipe landmarker perché
-                    # c'è stato un salto temporale brusco
+                    # Il seek può fermarsi su un keyframe: unica lettura della
+                    # posizione reale, poi il decoder la tiene aggiornata da sé
+                    seek_tgt = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+                    # Salto temporale brusco: reset() scarta i landmark in cache
+                    # e fa avanzare il timestamp di un intervallo ampio, così lo
+                    # smoothing non unisce la posa di prima e quella di dopo
                     detector.reset()
+                    decoder = DecoderThread(cap, fps, target_fps, start_frame=seek_tgt, after_seek=True,
+                                            schedule=schedule)
+                    decoder.start()
+                    next_deadline = None
+                    last_frame_time = None
+                    # La nuova posizione va mostrata subito, senza l'FPS di
+                    # prima del seek (in pausa non va mostrato affatto)
+                    self._pending_status.pop("fps", None)
+                    self._last_status_time = 0.0
 
                 if not playing and not seek_req:
-                    # In pausa: dormi un po' e ricontrolla
-                    time.sleep(0.05)
+                    # In pausa: attendi play(), seek o stop e ricontrolla
+                    next_deadline = None
+                    last_frame_time = None
+                    self._wait_while_paused()
                     continue
 
-                t_start = time.perf_counter()
+                if next_deadline is None:
+                    next_deadline = time.perf_counter()
 
-                # Saltiamo i frame in eccesso solo se NON stiamo facendo seek manuale
-                if not seek_req and fps > target_fps:
-                    frames_to_read = max(1, int(frame_count * frame_skip_ratio) - int((frame_count - 1) * frame_skip_ratio))
-                    for _ in range(frames_to_read - 1):
-                        cap.read()
-                
-                ret, frame = cap.read()
-                if not ret:
+                item = decoder.pop()
+                if item is None:
+                    if decoder.error is not None:
+                        raise decoder.error
+                    self._flush_status()
                     self.playback_finished.emit()
                     break
 
-                frame_count = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
-                self.position_changed.emit(frame_count)
-
-                # --- 1. OTTIMIZZAZIONE: Riduzione Risoluzione ---
-                # Ridimensioniamo il frame a una larghezza massima di 640px
-                # Questo migliora enormemente le performance di MediaPipe Lite 
+                # Il frame arriva già ridotto a max 640px dal decoder: questo
+                # migliora enormemente le performance di MediaPipe Lite
                 # e la stabilità dei landmark
-                MAX_WIDTH = 640
-                h, w = frame.shape[:2]
-                if w > MAX_WIDTH:
-                    ratio = MAX_WIDTH / w
-                    new_h = int(h * ratio)
-                    frame = cv2.resize(frame, (MAX_WIDTH, new_h), interpolation=cv2.INTER_AREA)
+                frame, frame_count = item
 
                 # Elabora il frame con il PoseDetector passando il target_fps
                 annotated, _, angles = detector.process_frame(frame, fps=target_fps)
-                self.frame_ready.emit(annotated)
-                if angles:
-                    self.angles_updated.emit(angles)
+                self._emit_frame(annotated)
 
                 # Mantieni il framerate originale target
-                elapsed = time.perf_counter() - t_start
-                sleep_time = frame_delay - elapsed
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                next_deadline += frame_delay
+                now = time.perf_counter()
+                if now < next_deadline:
+                    _precise_sleep(next_deadline - now)
+                elif now > next_deadline + _MAX_CATCH_UP_FRAMES * frame_delay:
+                    # Troppo in ritardo: riparti da adesso invece di accelerare
+                    # a lungo per recuperare. Ritardi minori si recuperano
+                    # saltando l'attesa nei frame successivi.
+                    next_deadline = now
+
+                # Emetti FPS effettivo (media mobile per non far oscillare la GUI)
+                now = time.perf_counter()
+                if last_frame_time is not None and now > last_frame_time:
+                    inst_fps = 1.0 / (now - last_frame_time)
+                    fps_ema = inst_fps if fps_ema == 0.0 else fps_ema + _FPS_EMA_ALPHA * (inst_fps - fps_ema)
+                last_frame_time = now
+                # Il frame mostrato dopo un seek in pausa non ha un FPS
+                self._publish_status(frame_count, fps_ema if self._play_event.is_set() else 0.0, angles)
+
+                # Se non teniamo il passo, riduciamo la frequenza delle detection
+                frames_since_adapt += 1
+                if frames_since_adapt >= _DETECT_ADAPT_INTERVAL:
+                    frames_since_adapt = 0
+                    if fps_ema < target_fps * 0.8 and detect_every < _MAX_DETECT_EVERY:
+                        detect_every += 1
+                        detector.set_detect_every(detect_every)
 
-                # Emetti FPS effettivo
-                real_elapsed = time.perf_counter() - t_start
-                if real_elapsed > 0:
-                    self.fps_updated.emit(1.0 / real_elapsed)
+        finally:
+            # Il decoder va fermato: il VideoCapture resta aperto per la
+            # prossima riproduzione e viene chiuso da stop_playback()
+            decoder.stop()
+
+        self._reset_playback_flags()
+
+    def _get_detector(self) -> PoseDetector:
+        """Restituisce il PoseDetector condiviso, pronto per una nuova sessione.
+
+        Usato solo in tempo reale: in modalità offline _detector è None e
+        ogni processo del pool ha il proprio.
+
+        Il landmarker resta aperto tra una riproduzione e l'altra: basta un
+        reset() dello stato della sessione precedente.
+        """
+        self._detector.reset()
+        self._detector.set_detect_every(1)
+        return self._detector
+
+    def _emit_frame(self, frame_rgb: np.ndarray, block: bool = False) -> bool:
+        """Emette frame_ready con un QImage che punta a un buffer del ring.
+
+        Il frame RGB viene convertito con cv2.cvtColor (SIMD) in BGRA, che in
+        memoria (little-endian) coincide con QImage.Format_RGB32, il formato
+        nativo dei QPixmap: QPixmap.fromImage nella GUI non deve più
+        convertire i pixel.
+
+        Se la GUI è indietro (già _MAX_FRAMES_IN_FLIGHT frame non confermati
+        con frame_displayed) il suo buffer potrebbe essere riscritto prima
+        del disegno: con block=False il frame viene scartato, con block=True
+        si attende la conferma (o uno stop).
+
+        Se cambia la risoluzione il ring viene riallocato solo dopo la
+        conferma di tutti i frame in volo: la copia del QImage accodata alla
+        GUI non tiene in vita il buffer numpy, quindi un frame ancora in coda
+        (anche di un video precedente) punterebbe a memoria liberata.
+
+        Returns:
+            True se il frame è stato emesso.
+        """
+        h, w = frame_rgb.shape[:2]
+        shape = (h, w, 4)
+        with self._in_flight_cond:
+            realloc = not self._display_bufs or self._display_bufs[0].shape != shape
+            limit = 1 if realloc else _MAX_FRAMES_IN_FLIGHT
+            while self._frames_in_flight >= limit:
+                if not block or self._stop_event.is_set():
+                    return False
+                self._in_flight_cond.wait(timeout=0.05)
+            self._frames_in_flight += 1
+            if realloc:
+                self._display_bufs = [np.empty(shape, dtype=np.uint8) for _ in range(_FRAME_RING_SIZE)]
+                self._display_idx = 0
+        display = self._next_display_buffer()
+        cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGRA, dst=display)
+        qt_image = QImage(display.data, w, h, display.strides[0], QImage.Format.Format_RGB32)
+        self.frame_ready.emit(qt_image)
+        return True
+
+    def _next_display_buffer(self) -> np.ndarray:
+        """Restituisce il prossimo buffer di visualizzazione del ring.
+
+        I buffer sono _FRAME_RING_SIZE, come il ring dei frame emessi: un
+        buffer viene riscritto solo quando il suo QImage non è più in uso.
+        """
+        buf = self._display_bufs[self._display_idx]
+        self._display_idx = (self._display_idx + 1) % _FRAME_RING_SIZE
+        return buf
+
+    def _publish_status(self, frame: int, fps: float, angles: dict) -> None:
+        """Aggiorna lo stato in sospeso e lo emette se è passato _STATUS_INTERVAL.
+
+        fps = 0.0 (non ancora misurato) e angles vuoto non sovrascrivono
+        gli ultimi valori validi.
+        """
+        status = self._pending_status
+        status["frame"] = frame
+        if fps > 0.0:
+            status["fps"] = fps
+        if angles:
+            status["angles"] = angles
+        if time.perf_counter() - self._last_status_time >= _STATUS_INTERVAL:
+            self._flush_status()
+
+    def _flush_status(self) -> None:
+        """Emette subito status_updated con lo stato in sospeso, se presente."""
+        if self._pending_status:
+            self.status_updated.emit(self._pending_status)
+            self._pending_status = {}
+            self._last_status_time = time.perf_counter()
+
+    def _wake_run_loop(self) -> None:
+        """Sveglia il thread se è fermo in _wait_while_paused() o in _emit_frame()."""
+        with QMutexLocker(self._mutex):
+            self._state_changed.wakeAll()
+        with self._in_flight_cond:
+            self._in_flight_cond.notify_all()
+
+    def _wait_while_paused(self, timeout_ms: int = 200) -> None:
+        """Attende finché non arriva play, seek o stop (al massimo timeout_ms).
+
+        I flag vengono ricontrollati sotto il mutex: chi li imposta sveglia
+        _state_changed tenendo lo stesso mutex, quindi la notifica non può
+        andare persa tra il controllo e l'attesa.
+        """
+        # La GUI deve mostrare la posizione esatta in cui ci si è fermati;
+        # l'FPS no: in pausa non c'è un framerate da mostrare
+        self._pending_status.pop("fps", None)
+        self._flush_status()
+        with QMutexLocker(self._mutex):
+            if self._play_event.is_set() or self._stop_event.is_set() or self._seek_event.is_set():
+                return
+            self._state_changed.wait(self._mutex, timeout_ms)
+
+    def _take_seek_request(self) -> int | None:
+        """Restituisce il frame di destinazione di un seek pendente (e lo consuma)."""
+        if not self._seek_event.is_set():
+            return None
+        with QMutexLocker(self._mutex):
+            self._seek_event.clear()
+            return self._seek_target
 
+    def _reset_playback_flags(self) -> None:
+        """Resetta i flag per una eventuale nuova riproduzione."""
+        self._play_event.clear()
+        self._stop_event.clear()
+
+    # ------------------------------------------------------------------
+    # Modalità offline (pool di processi)
+    # ------------------------------------------------------------------
+
+    def _run_offline(self, cap: cv2.VideoCapture, fps: float) -> None:
+        """Elabora tutti i frame con un pool di processi, senza pacing.
+
+        Il pool (e quindi il caricamento di MediaPipe e del modello in ogni
+        processo) viene creato una volta sola e riusato dopo ogni seek.
+        """
+        ctx = multiprocessing.get_context("spawn")
+        pool = ctx.Pool(self._n_workers, initializer=offline_worker.init_worker)
+        # Serializza l'uso del VideoCapture tra la lettura dei blocchi (thread
+        # interno del pool) e il riposizionamento fatto da un nuovo passaggio
+        cap_lock = threading.Lock()
+        try:
+            start_frame: int | None = 0
+            while start_frame is not None:
+                start_frame = self._run_offline_pass(pool, cap_lock, cap, fps, start_frame)
         finally:
-            cap.release()
-            detector.release()
+            pool.terminate()
+            pool.join()
+
+    def _run_offline_pass(self, pool, cap_lock: threading.Lock, cap: cv2.VideoCapture,
+                          fps: float, start_frame: int) -> int | None:
+        """Elabora il video da start_frame in poi.
+
+        I frame vengono letti a blocchi di _OFFLINE_CHUNK_SIZE in shared
+        memory e distribuiti ai processi con imap, che restituisce i risultati
+        nell'ordine di invio: frame_ready resta quindi monotono. Al massimo
+        2 * n_workers blocchi sono in volo, così la lettura non corre avanti
+        riempiendo la memoria.
+
+        Dopo un seek i blocchi ancora in volo del passaggio precedente
+        vengono completati dai worker e scartati: i loro risultati restano
+        nell'iteratore abbandonato.
+
+        Returns:
+            Il frame di destinazione se l'utente ha chiesto un seek, altrimenti None.
+        """
+        with cap_lock:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        # Il primo frame dopo un seek aggiorna subito la posizione
+        self._last_status_time = 0.0
+        abort = threading.Event()
+        slots = threading.Semaphore(2 * self._n_workers)
+        blocks: dict[str, shared_memory.SharedMemory] = {}
+
+        def make_tasks():
+            # Gira nel thread interno del pool che distribuisce i task
+            while True:
+                while not slots.acquire(timeout=0.05):
+                    if abort.is_set():
+                        return
+                # abort viene impostato sotto lo stesso lock: dopo la fine del
+                # passaggio nessun blocco viene più letto né registrato
+                with cap_lock:
+                    if abort.is_set():
+                        return
+                    block = self._read_offline_chunk(cap)
+                    if block is None:
+                        return
+                    shm, shape = block
+                    blocks[shm.name] = shm
+                yield shm.name, shape, fps
+
+        frame_count = start_frame
+        last_block_time: float | None = None
+        fps_ema = 0.0
 
-        # Resetta i flag per una eventuale nuova riproduzione
-        with QMutexLocker(self._mutex):
-            self._is_playing = False
-            self._stop_requested = False
+        try:
+            for shm_name, shape, angles_list in pool.imap(offline_worker.process_chunk, make_tasks()):
+                # FPS = throughput: frame del blocco / tempo dall'arrivo del
+                # blocco precedente. L'emissione dei singoli frame già pronti
+                # è quasi istantanea e non misura l'elaborazione.
+                now = time.perf_counter()
+                if last_block_time is not None and now > last_block_time:
+                    inst_fps = len(angles_list) / (now - last_block_time)
+                    fps_ema = inst_fps if fps_ema == 0.0 else fps_ema + _FPS_EMA_ALPHA * (inst_fps - fps_ema)
+                last_block_time = now
+
+                shm = blocks.pop(shm_name)
+                frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                try:
+                    for i, angles in enumerate(angles_list):
+                        # Pausa, stop e seek vengono controllati frame per frame
+                        while True:
+                            if self._stop_event.is_set():
+                                return None
+                            seek_tgt = self._take_seek_request()
+                            if seek_tgt is not None:
+                                return seek_tgt
+                            if self._play_event.is_set():
+                                break
+                            last_block_time = None
+                            self._wait_while_paused()
+
+                        frame_count += 1
+                        # _emit_frame converte in un buffer proprio: il blocco
+                        # può essere liberato subito dopo. In offline ogni
+                        # frame va mostrato: si attende la GUI invece di scartarlo.
+                        if not self._emit_frame(frames[i], block=True):
+                            return None
+                        self._publish_status(frame_count, fps_ema, angles)
+                finally:
+                    del frames
+                    shm.close()
+                    shm.unlink()
+                    slots.release()
+
+            self._flush_status()
+            self.playback_finished.emit()
+            return None
+
+        finally:
+            with cap_lock:
+                abort.set()
+                # Blocchi ancora in volo al momento dello stop/seek
+                for shm in blocks.values():
+                    shm.close()
+                    shm.unlink()
+                blocks.clear()
+
+    @staticmethod
+    def _read_offline_chunk(cap: cv2.VideoCapture) -> tuple[shared_memory.SharedMemory, tuple[int, ...]] | None:
+        """Legge fino a _OFFLINE_CHUNK_SIZE frame in un nuovo blocco di shared memory.
+
+        Returns:
+            (blocco, shape effettiva (n, h, w, 3)) oppure None a fine video.
+        """
+        ret, frame = cap.read()
+        if not ret:
+            return None
+
+        frame = _limit_width(frame)
+        shape = (_OFFLINE_CHUNK_SIZE, *frame.shape)
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        frames[0] = frame
+
+        n = 1
+        while n < _OFFLINE_CHUNK_SIZE:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            dst = frames[n]
+            out = _limit_width(frame, dst)
+            if out is not dst:
+                dst[...] = out
+            n += 1
+
+        del frames
+        return shm, (n, *shape[1:])
 
     def release(self) -> None:
         """Rilascia tutte le risorse."""
         self.stop_playback()
+        # Il detector si chiude solo se il thread non lo sta più usando
+        if self._detector is not None and not self.isRunning():
+            self._detector.release()
@@ -6,7 +6,7 @@ Contiene il VideoWidget, i controlli di riproduzione e uno stile dark moderno.
 import os
 
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QIcon, QFont
+from PyQt6.QtGui import QIcon, QFont, QImage
 from PyQt6.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -173,10 +173,8 @@ class MainWindow(QMainWindow):
         self._processor = VideoProcessor()
         self._processor.frame_ready.connect(self._on_frame_ready)
         self._processor.playback_finished.connect(self._on_playback_finished)
-        self._processor.fps_updated.connect(self._on_fps_updated)
+        self._processor.status_updated.connect(self._on_status_updated)
         self._processor.error_occurred.connect(self._on_error)
-        self._processor.position_changed.connect(self._on_position_changed)
-        self._processor.angles_updated.connect(self._on_angles_updated)
 
         # --- UI ---
         self._build_ui()
@@ -408,8 +406,10 @@ class MainWindow(QMainWindow):
         self._status_bar.showMessage("Riproduzione fermata")
         self._update_button_states()
 
-    def _on_frame_ready(self, frame) -> None:
-        self._video_widget.update_frame(frame)
+    def _on_frame_ready(self, qt_image: QImage) -> None:
+        self._video_widget.update_frame(qt_image)
+        # Il pixmap ha copiato i pixel: il buffer del frame è di nuovo libero
+        self._processor.frame_displayed()
 
     def _on_playback_finished(self) -> None:
         self._is_playing = False
@@ -419,6 +419,17 @@ class MainWindow(QMainWindow):
         self._status_bar.showMessage("Riproduzione terminata")
         self._update_button_states()
 
+    def _on_status_updated(self, status: dict) -> None:
+        """Ricevuto dal thread (~10 Hz): aggiorna posizione, FPS e angoli in un colpo solo."""
+        if "frame" in status:
+            self._on_position_changed(status["frame"])
+        # In pausa il messaggio "In pausa" non va sovrascritto da un FPS
+        # rimasto in coda da prima della pausa
+        if "fps" in status and self._is_playing:
+            self._on_fps_updated(status["fps"])
+        if "angles" in status:
+            self._on_angles_updated(status["angles"])
+
     def _on_fps_updated(self, fps: float) -> None:
         self._status_bar.showMessage(f"Riproduzione in corso… | {fps:.1f} FPS")
 
@@ -429,7 +440,7 @@ class MainWindow(QMainWindow):
         self._update_button_states()
 
     def _on_angles_updated(self, angles: dict) -> None:
-        """Ricevuto dal thread: aggiorna i valori degli angoli nella sidebar."""
+        """Aggiorna i valori degli angoli nella sidebar."""
         for name, label in self._angle_labels.items():
             if name in angles:
                 label.setText(f"{angles[name]:.1f}°")
@@ -444,7 +455,7 @@ class MainWindow(QMainWindow):
     # --- Slider Events ---
 
     def _on_position_changed(self, frame_idx: int) -> None:
-        """Ricevuto dal thread: aggiorna lo slider se l'utente non lo sta trascinando."""
+        """Aggiorna lo slider se l'utente non lo sta trascinando."""
         if not self._slider_pressed:
             # Blocchiamo i segnali per evitare loop ricorsivi con valueChanged
             self._slider.blockSignals(True)
@@ -7,11 +7,9 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtWidgets import QLabel
 
-import numpy as np
-
 
 class VideoWidget(QLabel):
-    """Widget che mostra un frame video (numpy BGR) scalato al contenitore."""
+    """Widget che mostra un frame video (QImage) scalato al contenitore."""
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -19,24 +17,35 @@ class VideoWidget(QLabel):
         self.setMinimumSize(320, 240)
         self.setStyleSheet("background-color: #1e1e1e; border-radius: 8px;")
         self.setText("Nessun video caricato")
+        # Ultimo frame non scalato, ridisegnato in alta qualità al resize
+        self._last_pixmap: QPixmap | None = None
 
-    def update_frame(self, frame: np.ndarray) -> None:
-        """Converte un frame BGR (numpy) in QPixmap e lo mostra."""
-        h, w, ch = frame.shape
-        bytes_per_line = ch * w
-        # BGR → RGB per Qt
-        qt_image = QImage(
-            frame.data, w, h, bytes_per_line, QImage.Format.Format_BGR888
-        )
-        pixmap = QPixmap.fromImage(qt_image)
-        scaled = pixmap.scaled(
+    def update_frame(self, qt_image: QImage) -> None:
+        """Converte un frame (QImage RGB) in QPixmap e lo mostra.
+
+        Durante la riproduzione si scala con FastTransformation: il resample
+        bilineare a ogni frame costerebbe qualche ms sul thread della GUI.
+        """
+        self._last_pixmap = QPixmap.fromImage(qt_image)
+        self._show_scaled(Qt.TransformationMode.FastTransformation)
+
+    def resizeEvent(self, event) -> None:
+        """Ridisegna l'ultimo frame con SmoothTransformation alla nuova dimensione."""
+        super().resizeEvent(event)
+        if self._last_pixmap is not None:
+            self._show_scaled(Qt.TransformationMode.SmoothTransformation)
+
+    def _show_scaled(self, mode: Qt.TransformationMode) -> None:
+        """Mostra _last_pixmap scalato al widget mantenendo l'aspect ratio."""
+        scaled = self._last_pixmap.scaled(
             self.size(),
             Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation,
+            mode,
         )
         self.setPixmap(scaled)
 
     def clear_display(self) -> None:
         """Resetta il widget allo stato iniziale."""
+        self._last_pixmap = None
         self.clear()
         self.setText("Nessun video caricato")
@@ -0,0 +1,145 @@
+"""
+Test dei calcoli numerici di core (nessuna GUI né modello richiesti).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from mediapipe.tasks.python.components.containers.landmark import NormalizedLandmark
+from mediapipe.tasks.python.vision import PoseLandmarksConnections, drawing_utils
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from core.detector import (  # noqa: E402
+    _CIRCLE_RADIUS,
+    _CONNECTION_COLOR,
+    _LANDMARK_COLOR,
+    _THICKNESS,
+    _draw_landmarks,
+)
+from core.angles_nb import ANGLE_NAMES, _pose_angles, pose_angles  # noqa: E402
+from core.utils import skip_schedule, skip_step  # noqa: E402
+
+
+# ----------------------------------------------------------------------
+# skip_schedule
+# ----------------------------------------------------------------------
+
+@pytest.mark.parametrize("ratio", [1.0, 2.0, 2.5, 59.94 / 30])
+def test_skip_schedule_matches_decoder_formula(ratio):
+    total = 500
+    expected = [
+        max(1, int(fc * ratio) - int((fc - 1) * ratio))
+        for fc in range(total + 1)
+    ]
+    assert skip_schedule(total, ratio) == expected
+    # Lo scalare usato dal DecoderThread oltre la tabella dà gli stessi valori
+    assert [int(skip_step(fc, ratio)) for fc in range(total + 1)] == expected
+
+
+def test_skip_schedule_unknown_frame_count():
+    # Con FRAME_COUNT non disponibile (-1) resta solo la posizione 0
+    assert len(skip_schedule(-1, 2.0)) == 1
+
+
+# ----------------------------------------------------------------------
+# pose_angles
+# ----------------------------------------------------------------------
+
+def _triangle_points() -> np.ndarray:
+    """Punti (x, y) con angoli noti: Ginocchio 90, Anca 180, Spalla 90, Gomito 135."""
+    return np.array(
+        [
+            [0.0, -1.0],  # Spalla
+            [1.0, -1.0],  # Gomito
+            [2.0, 0.0],   # Polso
+            [0.0, 0.0],   # Anca
+            [0.0, 1.0],   # Ginocchio
+            [1.0, 1.0],   # Caviglia
+        ],
+        dtype=np.float32,
+    )
+
+
+@pytest.mark.parametrize("func", [pose_angles, _pose_angles])
+def test_pose_angles_known_triangle(func):
+    angles = func(_triangle_points())
+    assert angles.dtype == np.float32
+    np.testing.assert_allclose(angles, [90.0, 180.0, 90.0, 135.0], atol=1e-3)
+
+
+def _joint_angle(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> float:
+    """Angolo in b tra i segmenti b-a e b-c, calcolato con il prodotto scalare."""
+    ba, bc = a - b, c - b
+    cos = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
+    return float(np.degrees(np.arccos(np.clip(cos, -1.0, 1.0))))
+
+
+@pytest.mark.parametrize("func", [pose_angles, _pose_angles])
+def test_pose_angles_names_map_to_joints(func):
+    # Punti asimmetrici: i quattro angoli sono tutti diversi, quindi uno
+    # scambio di ordine tra ANGLE_NAMES e il kernel non passa inosservato
+    p = np.array(
+        [
+            [0.1, -1.2],  # Spalla
+            [0.9, -0.7],  # Gomito
+            [1.1, 0.3],   # Polso
+            [0.0, 0.0],   # Anca
+            [0.4, 0.9],   # Ginocchio
+            [0.2, 1.9],   # Caviglia
+        ],
+        dtype=np.float32,
+    )
+    shoulder, elbow, wrist, hip, knee, ankle = p
+    expected = {
+        "Ginocchio": _joint_angle(hip, knee, ankle),
+        "Anca": _joint_angle(shoulder, hip, knee),
+        "Spalla": _joint_angle(hip, shoulder, elbow),
+        "Gomito": _joint_angle(shoulder, elbow, wrist),
+    }
+    assert len({round(v) for v in expected.values()}) == 4
+
+    actual = dict(zip(ANGLE_NAMES, func(p)))
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        assert actual[name] == pytest.approx(value, abs=1e-3), name
+
+
+# ----------------------------------------------------------------------
+# _draw_landmarks
+# ----------------------------------------------------------------------
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_draw_landmarks_matches_drawing_utils(seed):
+    rng = np.random.default_rng(seed)
+    n = 33
+    # Alcuni punti fuori dal frame e alcuni con visibility/presence bassa
+    xy = rng.uniform(-0.1, 1.1, size=(n, 2))
+    visibility = rng.uniform(0.0, 1.0, size=n)
+    presence = rng.uniform(0.0, 1.0, size=n)
+    landmarks = [
+        NormalizedLandmark(x=float(x), y=float(y), z=0.0,
+                           visibility=float(v), presence=float(p))
+        for (x, y), v, p in zip(xy, visibility, presence)
+    ]
+    lm_array = np.column_stack([xy, np.minimum(visibility, presence)]).astype(np.float32)
+
+    expected = np.zeros((360, 640, 3), dtype=np.uint8)
+    drawing_utils.draw_landmarks(
+        image=expected,
+        landmark_list=landmarks,
+        connections=PoseLandmarksConnections.POSE_LANDMARKS,
+        landmark_drawing_spec=drawing_utils.DrawingSpec(
+            color=_LANDMARK_COLOR, thickness=_THICKNESS, circle_radius=_CIRCLE_RADIUS
+        ),
+        connection_drawing_spec=drawing_utils.DrawingSpec(
+            color=_CONNECTION_COLOR, thickness=_THICKNESS
+        ),
+    )
+
+    actual = np.zeros_like(expected)
+    _draw_landmarks(actual, lm_array)
+
+    np.testing.assert_array_equal(actual, expected)